@@ -15,27 +15,53 @@ Author: Grant
 Version: 1.0.0
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
+from anyio import CancelScope, to_thread
+import aiofiles
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+import functools
+import hashlib
+import io
+import logging
+import logging.handlers
 import os
 from pathlib import Path
-import tempfile
-import uuid
-import json
-import shutil
-from typing import Optional, List, Dict, Any
+import secrets
+import orjson
+import queue
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Callable, Iterator, FrozenSet, Tuple
 
 # DotsOCR核心模块导入
 from dots_ocr.parser import DotsOCRParser
 from dots_ocr.utils.consts import MIN_PIXELS, MAX_PIXELS
+from server.cache import ResultCache
 from server.storage import FileStorage
 from server.tasks import TaskManager, TaskStatus
-from server.config import ensure_directories
+from server.limits import AsyncRateLimiter
+from server.middleware import UploadSizeLimitMiddleware
+from server.sessions import SessionDirPool
+from server.config import TEMP_DIR, SESSION_POOL_SIZE, API_WORKERS, LOG_LEVEL, PARSE_CONCURRENCY, PAGE_CONCURRENCY, PARSE_RPS, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, WRITE_BUFFER_SIZE, DOWNLOAD_CHUNK_SIZE, ensure_directories
 
 # ==================== FastAPI应用初始化 ====================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时预热解析器与到 vLLM 的连接，避免首个请求承担建连开销；预热失败只记录告警，不阻止服务启动"""
+    try:
+        await to_thread.run_sync(dots_parser.warmup)
+    except Exception as e:
+        logger.warning("解析器预热失败，将在首个请求时再建立连接: %s", e)
+    yield
+
 app = FastAPI(
+    lifespan=lifespan,
     title="DotsOCR API Service",
     description="高性能OCR文档解析API服务，支持PDF和图像文件的文本识别与布局分析",
     version="1.0.0",
@@ -43,8 +69,30 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# 在读取请求体之前拒绝超限上传
+app.add_middleware(UploadSizeLimitMiddleware, max_size=MAX_UPLOAD_SIZE)
+
 # ==================== 全局配置 ====================
 
+# 日志配置：级别由 DOTSOCR_LOG_LEVEL 控制（默认 WARNING），低于该级别的日志不做格式化直接跳过；
+# 请求线程只把日志记录放入队列，格式化与写 stderr 由 QueueListener 的后台线程完成
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# 入队前只合并消息与参数（含异常堆栈），完整格式由监听线程上的 handler 负责
+_log_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=LOG_LEVEL, handlers=[_log_queue_handler])
+logger = logging.getLogger("dots_ocr.api")
+
+# 允许上传的文件扩展名（模块级常量，避免每个请求重复构造列表）
+_IMG_EXTS = frozenset({".jpg", ".jpeg", ".png"})
+_PDF_EXTS = frozenset({".pdf"})
+_ALL_EXTS = _IMG_EXTS | _PDF_EXTS
+
 # 初始化通用目录
 ensure_directories()
 
@@ -53,13 +101,31 @@ dots_parser = DotsOCRParser(
     ip="localhost",          # VLLM服务器IP地址
     port=8000,              # VLLM服务器端口
     dpi=200,                # 图像DPI设置
+    num_thread=PAGE_CONCURRENCY,  # PDF 页面并发数
     min_pixels=MIN_PIXELS,  # 最小像素限制
     max_pixels=MAX_PIXELS   # 最大像素限制
 )
 
+# 解析专用线程池：按推理服务的并发能力限定线程数，避免占满默认线程池或造成线程膨胀
+_PARSE_POOL = ThreadPoolExecutor(max_workers=PARSE_CONCURRENCY, thread_name_prefix="dots-parse")
+# 并发闸门与限速器：请求在事件循环中排队（客户端断开即可取消），放行后再提交到线程池
+_PARSE_SEM = asyncio.Semaphore(PARSE_CONCURRENCY)
+_PARSE_RATE_LIMITER = AsyncRateLimiter(PARSE_RPS)
+# 解析队列深度统计，供 /health 观察与调参
+_parse_queue_stats = {"running": 0, "waiting": 0}
+
+# 请求级临时会话目录池：启动时预建目录，请求间复用，进程退出时清理
+_session_dirs = SessionDirPool(TEMP_DIR, max_size=SESSION_POOL_SIZE)
+_session_dirs.prewarm()
+atexit.register(_session_dirs.close)
+
 # 文件存储与任务管理实例
 file_storage = FileStorage()
 task_manager = TaskManager()
+atexit.register(task_manager.shutdown)
+
+# 同步解析结果缓存：相同内容与参数的重复上传直接返回缓存结果
+result_cache = ResultCache()
 
 # ==================== 数据模型定义 ====================
 
@@ -73,6 +139,7 @@ class ParseResult(BaseModel):
     success: bool                              # 解析是否成功
     total_pages: int                          # 总页数
     results: List[Dict[str, Any]]             # 解析结果列表
+    file_id: Optional[str] = None             # persist=true 时源文件在存储中的ID
 
 class UploadResponse(BaseModel):
     """上传文件响应模型"""
@@ -100,25 +167,29 @@ class TaskInfo(BaseModel):
 
 # ==================== 工具函数 ====================
 
-def create_temp_session_dir() -> tuple[str, str]:
+def get_file_extension(filename: str) -> str:
     """
-    创建唯一的临时会话目录
+    提取小写文件扩展名，语义与 Path(filename).suffix 一致，但无需构造 Path 对象
     
+    Args:
+        filename: 文件名（可包含路径）
+        
     Returns:
-        tuple: (临时目录路径, 会话ID)
+        str: 形如 ".pdf" 的扩展名，无扩展名时返回空字符串
     """
-    session_id = uuid.uuid4().hex[:8]
-    temp_dir = os.path.join(tempfile.gettempdir(), f"dots_ocr_api_{session_id}")
-    os.makedirs(temp_dir, exist_ok=True)
-    return temp_dir, session_id
+    name = filename.rpartition("/")[2]
+    index = name.rfind(".")
+    if 0 < index < len(name) - 1:
+        return name[index:].lower()
+    return ""
 
-def validate_file_upload(file: UploadFile, allowed_extensions: List[str]) -> str:
+def validate_file_upload(file: UploadFile, allowed_extensions: FrozenSet[str]) -> str:
     """
     验证上传文件的有效性
     
     Args:
         file: 上传的文件对象
-        allowed_extensions: 允许的文件扩展名列表
+        allowed_extensions: 允许的文件扩展名集合
         
     Returns:
         str: 文件扩展名
@@ -136,20 +207,58 @@ def validate_file_upload(file: UploadFile, allowed_extensions: List[str]) -> str
     
     try:
         # 提取文件扩展名
-        file_ext = Path(file.filename).suffix.lower()
-    except TypeError:
+        file_ext = get_file_extension(file.filename)
+    except (TypeError, AttributeError):
         raise HTTPException(status_code=400, detail="文件名格式无效")
     
     # 验证文件格式
     if file_ext not in allowed_extensions:
         raise HTTPException(
             status_code=400, 
-            detail=f"不支持的文件格式。支持的格式: {', '.join(allowed_extensions)}"
+            detail=f"不支持的文件格式。支持的格式: {', '.join(sorted(allowed_extensions))}"
         )
     
     return file_ext
 
-async def save_upload_to_temp(file: UploadFile, temp_dir: str, session_id: str, file_ext: str) -> str:
+async def stream_upload_to_path(file: UploadFile, path: str) -> str:
+    """
+    将上传的文件按块流式写入指定路径，并在写入过程中增量计算内容哈希
+    
+    Args:
+        file: 上传的文件对象
+        path: 目标文件路径（所在目录须已存在）
+        
+    Returns:
+        str: 文件内容的 blake2b 摘要（十六进制）
+        
+    Raises:
+        HTTPException: 文件过大、为空或保存失败时抛出异常
+    """
+    try:
+        # 按块流式异步写入，避免整文件读入内存，磁盘写入期间不阻塞事件循环
+        size = 0
+        digest = hashlib.blake2b(digest_size=16)
+        async with aiofiles.open(path, "wb", buffering=WRITE_BUFFER_SIZE) as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                # 无 Content-Length 的分块上传在此按累计大小兜底限制
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=f"上传文件过大，最大支持 {MAX_UPLOAD_SIZE // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await buffer.write(chunk)
+        
+        # 写入成功即说明文件已存在，无需再 stat 校验
+        logger.debug("文件已保存到: %s (%d bytes)", path, size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"文件保存错误: {str(e)}")
+    
+    if not size:
+        raise HTTPException(status_code=400, detail="上传的文件为空")
+    return digest.hexdigest()
+
+async def save_upload_to_temp(file: UploadFile, temp_dir: str, session_id: str, file_ext: str) -> Tuple[str, str]:
     """
     将上传的文件保存到临时目录
     
@@ -160,69 +269,231 @@ async def save_upload_to_temp(file: UploadFile, temp_dir: str, session_id: str,
         file_ext: 文件扩展名
         
     Returns:
-        str: 保存的文件绝对路径
+        Tuple[str, str]: 保存的文件绝对路径，以及文件内容的 blake2b 摘要（十六进制）
         
     Raises:
         HTTPException: 文件保存失败时抛出异常
     """
-    # 读取文件内容
-    file_content = await file.read()
-    if not file_content:
-        raise HTTPException(status_code=400, detail="上传的文件为空")
-    
-    # 生成临时文件路径
-    temp_path = os.path.join(temp_dir, f"upload_{session_id}{file_ext}")
+    # 会话目录由目录池给出，已是绝对路径；直接拼接，写入后无需再做路径或存在性检查
+    temp_path = f"{temp_dir}/upload_{session_id}{file_ext}"
+    return temp_path, await stream_upload_to_path(file, temp_path)
+
+async def save_upload_to_storage(file: UploadFile) -> Tuple[Dict, str]:
+    """
+    将上传的文件直接流式写入存储目录的最终位置并登记到文件索引（只写一次盘，不经临时目录中转）
     
+    Args:
+        file: 上传的文件对象
+        
+    Returns:
+        Tuple[Dict, str]: 文件元信息，以及文件内容的 blake2b 摘要（十六进制）
+        
+    Raises:
+        HTTPException: 文件保存失败时抛出异常，已创建的存储目录会被清理
+    """
+    filename = file.filename or "upload"
+    file_id, stored_path = await to_thread.run_sync(file_storage.allocate, filename)
     try:
-        # 写入文件内容到临时文件
-        with open(temp_path, "wb") as buffer:
-            buffer.write(file_content)
+        content_digest = await stream_upload_to_path(file, str(stored_path))
+        meta = await to_thread.run_sync(file_storage.register, file_id, filename, stored_path)
+    except BaseException:
+        await discard_stored_file(file_id)
+        raise
+    return meta, content_digest
+
+async def discard_stored_file(file_id: Optional[str]) -> None:
+    """
+    删除已写入存储的文件及其索引（上传失败，或 persist=true 时解析失败）
+    
+    Args:
+        file_id: 文件ID，为 None 时不做任何事
+    """
+    if file_id is None:
+        return
+    # 删除目录与 SQLite 记录放到线程池执行；屏蔽取消，确保客户端断开时也能清理干净
+    with CancelScope(shield=True):
+        await to_thread.run_sync(file_storage.remove, file_id)
+
+async def hash_upload(file: UploadFile) -> str:
+    """
+    按块流式读取上传文件（Starlette 已将其暂存为 SpooledTemporaryFile）计算内容哈希，读完后回到开头；
+    用于图像：解析线程直接从暂存文件解码，既省去临时文件的一写一读，也不在排队等待解析期间占用整文件大小的内存
+    
+    Args:
+        file: 上传的文件对象
         
-        # 验证文件是否成功创建
-        abs_temp_path = os.path.abspath(temp_path)
-        if not os.path.exists(abs_temp_path):
-            raise HTTPException(status_code=500, detail="临时文件创建失败")
-            
-        print(f"DEBUG: 文件已保存到: {abs_temp_path} ({len(file_content)} bytes)")
-        return abs_temp_path
+    Returns:
+        str: 文件内容的 blake2b 摘要（十六进制）
         
+    Raises:
+        HTTPException: 文件过大、为空或读取失败时抛出异常
+    """
+    too_large = HTTPException(status_code=413, detail=f"上传文件过大，最大支持 {MAX_UPLOAD_SIZE // (1024 * 1024)} MB")
+    # multipart 解析时已统计文件大小，先据此拒绝
+    if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+        raise too_large
+    try:
+        size = 0
+        digest = hashlib.blake2b(digest_size=16)
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                raise too_large
+            digest.update(chunk)
+        await file.seek(0)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"文件保存错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"文件读取错误: {str(e)}")
+    if not size:
+        raise HTTPException(status_code=400, detail="上传的文件为空")
+    return digest.hexdigest()
 
-def cleanup_temp_directory(temp_dir: str):
+def write_small_file(path, payload: bytes) -> None:
     """
-    清理临时目录及其所有内容
+    一次性写入小文件：直接使用文件描述符写入，省去 BufferedWriter/TextIOWrapper 的构造开销
     
     Args:
-        temp_dir: 要清理的临时目录路径
+        path: 目标文件路径
+        payload: 要写入的完整内容
     """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
     try:
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            print(f"DEBUG: 已清理临时目录: {temp_dir}")
-    except Exception as e:
-        print(f"WARNING: 清理临时目录失败: {str(e)}")
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+async def run_parse_call(parse_call: Callable[[], Any]) -> Any:
+    """
+    在并发上限与速率限制下执行阻塞的解析调用
+    
+    Args:
+        parse_call: 无参可调用对象（通常为 functools.partial 包装的解析器方法）
+        
+    Returns:
+        Any: 解析调用的返回值
+    """
+    _parse_queue_stats["waiting"] += 1
+    try:
+        await _PARSE_SEM.acquire()
+    finally:
+        _parse_queue_stats["waiting"] -= 1
+    _parse_queue_stats["running"] += 1
+    try:
+        await _PARSE_RATE_LIMITER.acquire()
+        return await asyncio.get_running_loop().run_in_executor(_PARSE_POOL, parse_call)
+    finally:
+        _parse_queue_stats["running"] -= 1
+        _PARSE_SEM.release()
 
 def load_layout_info(layout_info_path: str) -> Dict[str, Any]:
     """
-    加载布局信息文件
+    加载布局信息文件（仅在解析器结果未携带 layout_info 时作为回退使用）
     
     Args:
         layout_info_path: 布局信息文件路径
         
     Returns:
-        Dict: 布局信息数据，加载失败时返回空字典
+        Dict: 布局信息数据，文件不存在或加载失败时返回空字典
     """
-    if not layout_info_path or not os.path.exists(layout_info_path):
+    if not layout_info_path:
         return {}
     
     try:
-        with open(layout_info_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        # 整个文件一次性读取，绕过 BufferedReader 直接解析
+        with open(layout_info_path, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
     except Exception as e:
-        print(f"WARNING: 布局信息文件读取失败: {str(e)}")
+        logger.warning("布局信息文件读取失败: %s", e)
         return {}
 
+class LargeChunkFileResponse(FileResponse):
+    """
+    大块读取的文件响应：服务器支持 pathsend 扩展时由其零拷贝发送；
+    否则按 DOWNLOAD_CHUNK_SIZE 分块读取，减少线程切换与 send 调用次数（默认仅 64 KiB）
+    """
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+# 下载响应统一附加，告知中间代理不要对已压缩/二进制内容再做转换（如重新 gzip）
+_NO_TRANSFORM_HEADERS = {"Cache-Control": "no-transform"}
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    归档写入器（zipfile/zstd）的只写输出目标：暂存写入的字节，供生成器逐段取出发送。
+    不支持 seek/tell，zipfile 会自动改用数据描述符方式写入。
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        """取出并清空当前已写入的字节"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# 文本类产物压缩收益明显，使用最低级别 DEFLATE；图片等已压缩内容直接存储
+_DEFLATE_SUFFIXES = frozenset({".json", ".jsonl", ".md"})
+
+def iter_zip_directory(root_dir: Path) -> Iterator[bytes]:
+    """
+    将目录边打包边输出为 zip 字节流，不在磁盘上生成完整压缩包
+    
+    Args:
+        root_dir: 要打包的目录
+        
+    Yields:
+        bytes: zip 数据片段
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for path in sorted(root_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            zinfo = zipfile.ZipInfo.from_file(path, path.relative_to(root_dir).as_posix())
+            if path.suffix.lower() in _DEFLATE_SUFFIXES:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zinfo._compresslevel = 1  # ZipFile.open 按条目读取压缩级别，无公开参数
+            with open(path, "rb") as src, zf.open(zinfo, "w") as dst:
+                while chunk := src.read(DOWNLOAD_CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield buffer.drain()
+    # 写出中央目录
+    yield buffer.drain()
+
+def iter_tar_zst_directory(root_dir: Path) -> Iterator[bytes]:
+    """
+    将目录边打包边输出为 tar.zst 字节流（zstd 压缩速度远高于 DEFLATE）
+    
+    Args:
+        root_dir: 要打包的目录
+        
+    Yields:
+        bytes: tar.zst 数据片段
+    """
+    import pyzstd
+
+    buffer = _StreamBuffer()
+    with pyzstd.ZstdFile(buffer, mode="w", level_or_option=3) as zst:
+        with tarfile.open(fileobj=zst, mode="w|") as tar:
+            for path in sorted(root_dir.rglob("*")):
+                if not path.is_file():
+                    continue
+                tar.add(str(path), arcname=path.relative_to(root_dir).as_posix())
+                yield buffer.drain()
+    # 写出 tar 结束块与 zstd 帧尾
+    yield buffer.drain()
+
 # ==================== API端点定义 ====================
 
 # -------- 文件管理：上传/列表/下载 --------
@@ -233,30 +504,27 @@ async def upload_file(file: UploadFile = File(..., description="要上传的文
     上传源文件并保存至磁盘，返回文件 ID。
     """
     # 验证扩展名
-    _ = validate_file_upload(file, ['.pdf', '.jpg', '.jpeg', '.png'])
-    # 读取内容
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="上传的文件为空")
-    # 存储并返回 ID
-    meta = file_storage.save_upload(file.filename or "upload", content)
+    _ = validate_file_upload(file, _ALL_EXTS)
+    # 流式异步写入存储目录并登记索引（超限 413、空文件 400，失败时清理已建目录），不阻塞事件循环
+    meta, _ = await save_upload_to_storage(file)
     return UploadResponse(id=meta["id"], filename=meta["filename"], size=meta["size"])  # type: ignore[index]
 
 
 @app.get("/files", response_model=List[FileMeta], summary="查看所有已上传文件")
 async def list_files():
     """返回文件元信息列表。"""
-    items = file_storage.list_files()
+    # 文件索引在 SQLite 中，查询放到线程池执行，避免数据库锁等待阻塞事件循环
+    items = await to_thread.run_sync(file_storage.list_files)
     return [FileMeta(id=i["id"], filename=i["filename"], stored_path=i["stored_path"], size=i["size"]) for i in items]  # type: ignore[index]
 
 
 @app.get("/files/{file_id}", summary="按ID下载源文件")
 async def download_file(file_id: str):
     """根据文件 ID 下载源文件。"""
-    path = file_storage.get_file_path(file_id)
+    path = await to_thread.run_sync(file_storage.get_file_path, file_id)
     if not path:
         raise HTTPException(status_code=404, detail="文件不存在")
-    return FileResponse(path=str(path), filename=Path(path).name)
+    return LargeChunkFileResponse(path=str(path), filename=Path(path).name, headers=_NO_TRANSFORM_HEADERS)
 
 
 # -------- 任务管理：创建/状态/列表/下载结果 --------
@@ -269,7 +537,7 @@ async def create_parse_task(
     mock: bool = False,
 ):
     """根据文件ID创建解析任务，后台异步执行。"""
-    source_path = file_storage.get_file_path(file_id)
+    source_path = await to_thread.run_sync(file_storage.get_file_path, file_id)
     if not source_path:
         raise HTTPException(status_code=404, detail="文件不存在")
 
@@ -277,15 +545,17 @@ async def create_parse_task(
         # 任务执行函数：调用 DotsOCRParser 进行解析，并将成果文件写入 task_output_dir
         try:
             # 依据 mock 参数决定是否真实调用模型
-            ext = Path(source_path).suffix.lower()
-            filename = Path(source_path).stem
+            # source_path 已是 Path，任务输出目录由 TaskManager 创建，此处只构造一次路径对象
+            ext = source_path.suffix.lower()
+            filename = source_path.stem
+            output_dir = Path(task_output_dir)
+            jsonl_path = output_dir / f"{filename}.jsonl"
             results = []
             if mock:
                 # 写入模拟结果文件，避免实际模型调用
-                os.makedirs(task_output_dir, exist_ok=True)
-                layout_json_path = Path(task_output_dir) / f"{filename}.json"
-                layout_img_path = Path(task_output_dir) / f"{filename}.jpg"
-                md_path = Path(task_output_dir) / f"{filename}.md"
+                layout_json_path = output_dir / f"{filename}.json"
+                layout_img_path = output_dir / f"{filename}.jpg"
+                md_path = output_dir / f"{filename}.md"
                 # 伪造一个最小可用布局
                 fake_cells = [{
                     "bbox": [10, 10, 200, 60],
@@ -296,22 +566,19 @@ async def create_parse_task(
                     "category": "Text",
                     "text": "This is a mock paragraph for testing."
                 }]
-                with open(layout_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(fake_cells, f, ensure_ascii=False)
-                with open(md_path, 'w', encoding='utf-8') as f:
-                    f.write("# Mock Result\n\nThis is a mock markdown output.")
+                # 模拟产物均为一次性写入的小文件，直接走 os.write
+                write_small_file(layout_json_path, orjson.dumps(fake_cells))
+                write_small_file(md_path, "# Mock Result\n\nThis is a mock markdown output.".encode("utf-8"))
                 # 占位图像
-                with open(layout_img_path, 'wb') as f:
-                    f.write(b"mock")
+                write_small_file(layout_img_path, b"mock")
                 # 写 jsonl 汇总
-                with open(Path(task_output_dir) / f"{filename}.jsonl", 'w', encoding='utf-8') as w:
-                    w.write(json.dumps({
-                        "page_no": 0,
-                        "layout_info_path": str(layout_json_path),
-                        "layout_image_path": str(layout_img_path),
-                        "md_content_path": str(md_path),
-                        "file_path": str(source_path),
-                    }, ensure_ascii=False) + "\n")
+                write_small_file(jsonl_path, orjson.dumps({
+                    "page_no": 0,
+                    "layout_info_path": str(layout_json_path),
+                    "layout_image_path": str(layout_img_path),
+                    "md_content_path": str(md_path),
+                    "file_path": str(source_path),
+                }) + b"\n")
             else:
                 # 将解析输出定向到任务目录
                 if ext == '.pdf':
@@ -331,7 +598,7 @@ async def create_parse_task(
                     )
             # 汇总 artifacts：返回主要文件路径，方便客户端下载
             artifacts = {
-                "result_jsonl": str(Path(task_output_dir) / f"{filename}.jsonl"),
+                "result_jsonl": str(jsonl_path),
                 "dir": task_output_dir,
             }
             return {"ok": True, "artifacts": artifacts}
@@ -344,7 +611,8 @@ async def create_parse_task(
 
 @app.get("/tasks/{task_id}", response_model=TaskInfo, summary="查看任务状态")
 async def get_task(task_id: str):
-    task = task_manager.get(task_id)
+    # 已淘汰或未知的任务会回退查询 SQLite，放到线程池执行，避免阻塞事件循环
+    task = await to_thread.run_sync(task_manager.get, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     return TaskInfo(id=task["id"], status=task["status"], progress=task.get("progress", 0), error=task.get("error"))  # type: ignore[index]
@@ -357,24 +625,178 @@ async def list_tasks():
 
 
 @app.get("/tasks/{task_id}/download", summary="下载任务结果目录(压缩包)")
-async def download_task_result(task_id: str):
-    task = task_manager.get(task_id)
+async def download_task_result(
+    task_id: str,
+    archive_format: str = Query("zip", alias="format", description="压缩包格式: zip 或 tar.zst"),
+):
+    if archive_format not in ("zip", "tar.zst"):
+        raise HTTPException(status_code=400, detail="不支持的压缩包格式，可选: zip, tar.zst")
+    if archive_format == "tar.zst":
+        try:
+            import pyzstd  # noqa: F401  可选依赖，仅 tar.zst 下载需要
+        except ImportError:
+            raise HTTPException(status_code=501, detail="服务端未安装 pyzstd，暂不支持 tar.zst 格式")
+    task = await to_thread.run_sync(task_manager.get, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     task_dir = Path(task["dir"])  # type: ignore[index]
     if not task_dir.exists():
         raise HTTPException(status_code=404, detail="任务输出目录不存在")
-    # 将任务目录打包为 zip
-    zip_path = task_dir.with_suffix("")
-    archive_file = str(zip_path)  # shutil.make_archive 会自动加后缀
-    archive = shutil.make_archive(base_name=archive_file, format="zip", root_dir=str(task_dir))
-    return FileResponse(path=archive, filename=f"{task_id}.zip")
+    # 将任务目录边打包边下发，不落盘生成压缩包
+    if archive_format == "tar.zst":
+        return StreamingResponse(
+            iter_tar_zst_directory(task_dir),
+            media_type="application/zstd",
+            headers={"Content-Disposition": f'attachment; filename="{task_id}.tar.zst"', **_NO_TRANSFORM_HEADERS},
+        )
+    return StreamingResponse(
+        iter_zip_directory(task_dir),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{task_id}.zip"', **_NO_TRANSFORM_HEADERS},
+    )
+
+# -------- 同步解析：图像/PDF/通用 --------
+
+async def _run_parse(file: UploadFile, file_ext: str, prompt_mode: str, fitz_preprocess: bool, is_pdf: bool, persist: bool = False) -> ParseResult:
+    """
+    解析已通过格式校验的上传文件（图像与PDF共用同一流程）
+    
+    Args:
+        file: 上传的文件
+        file_ext: 已校验的文件扩展名
+        prompt_mode: 提示模式
+        fitz_preprocess: 是否启用fitz预处理（仅对图像生效）
+        is_pdf: 是否按PDF解析
+        persist: 是否将源文件保存到文件存储（可再用于 /tasks/parse 与 /files 下载）
+        
+    Returns:
+        ParseResult: 包含所有页面解析结果的响应对象
+    """
+    session_id = secrets.token_hex(4)
+    kind = "PDF" if is_pdf else "图像"
+    file_id = None
+    
+    try:
+        # 1. 从目录池借用会话临时目录，退出上下文时清空并归还
+        with _session_dirs.session() as temp_dir:
+            logger.debug("创建%s解析会话 %s, 临时目录: %s", kind, session_id, temp_dir)
+            
+            # 2. 需要持久化的文件直接写入存储目录；否则 PDF 保存到临时文件，图像由解析线程直接从暂存的上传文件解码，省去临时文件的一写一读
+            image_stream = None
+            if persist:
+                meta, content_digest = await save_upload_to_storage(file)
+                file_id = meta["id"]
+                source_path = meta["stored_path"]
+            elif is_pdf:
+                source_path, content_digest = await save_upload_to_temp(file, temp_dir, session_id, file_ext)
+            else:
+                content_digest = await hash_upload(file)
+                image_stream = file.file
+            
+            # 相同内容 + 相同解析参数（含解析器的 dpi/像素配置）命中缓存时直接返回，跳过解析器
+            cache_key = ResultCache.make_key(
+                content_digest, "pdf" if is_pdf else "image", prompt_mode, int(fitz_preprocess),
+                dots_parser.dpi, dots_parser.min_pixels, dots_parser.max_pixels,
+            )
+            cached = await to_thread.run_sync(result_cache.get, cache_key)
+            if cached is not None:
+                logger.debug("%s解析命中结果缓存: %s", kind, cache_key)
+                for page in cached["results"]:
+                    page["session_id"] = session_id
+                return ParseResult(success=True, total_pages=cached["total_pages"], results=cached["results"], file_id=file_id)
+            
+            # 3. 创建输出目录（复用的会话目录会保留该子目录）
+            output_dir = f"{temp_dir}/output"
+            try:
+                os.mkdir(output_dir)
+            except FileExistsError:
+                pass
+            
+            # 4. 调用DotsOCR解析器
+            logger.debug("开始解析%s，模式: %s", kind, prompt_mode)
+            if is_pdf:
+                parse_call = functools.partial(
+                    dots_parser.parse_pdf,
+                    input_path=source_path,
+                    filename=f"api_pdf_{session_id}",
+                    prompt_mode=prompt_mode,
+                    save_dir=output_dir
+                )
+            elif image_stream is not None:
+                parse_call = functools.partial(
+                    dots_parser.parse_image_stream,
+                    stream=image_stream,
+                    filename=f"api_image_{session_id}",
+                    prompt_mode=prompt_mode,
+                    save_dir=output_dir,
+                    fitz_preprocess=fitz_preprocess
+                )
+            else:
+                parse_call = functools.partial(
+                    dots_parser.parse_image,
+                    input_path=source_path,
+                    filename=f"api_image_{session_id}",
+                    prompt_mode=prompt_mode,
+                    save_dir=output_dir,
+                    fitz_preprocess=fitz_preprocess
+                )
+            # 解析器为同步阻塞调用，经并发/限速闸门后放到解析专用线程池执行，避免阻塞事件循环
+            results = await run_parse_call(parse_call)
+            
+            if not results:
+                raise HTTPException(status_code=500, detail=f"{'PDF' if is_pdf else ''}解析器未返回结果")
+            
+            # 5. 解析器已在结果中携带各页布局信息；仅缺失时才回退到并发读取布局文件
+            # 以键是否存在判断：解析器合法返回的空布局不重读；无布局文件的页面（如 prompt_ocr）直接为空，不做线程切换
+            layouts = [result.get('layout_info', {}) for result in results]
+            missing = [
+                i for i, result in enumerate(results)
+                if 'layout_info' not in result and result.get('layout_info_path')
+            ]
+            if missing:
+                loaded = await asyncio.gather(*[
+                    to_thread.run_sync(load_layout_info, results[i].get('layout_info_path'))
+                    for i in missing
+                ])
+                for i, layout_info in zip(missing, loaded):
+                    layouts[i] = layout_info
+            formatted_results = [{
+                "page_no": result.get('page_no', 0),
+                "full_layout_info": layout_info,
+                "session_id": session_id,
+                "filtered": result.get('filtered', False)
+            } for result, layout_info in zip(results, layouts)]
+            
+            total_elements = sum(len(layout_info) for layout_info in layouts)
+            logger.debug("%s解析完成，共 %d 页，检测到 %d 个元素", kind, len(results), total_elements)
+            
+            # 6. 写入结果缓存并构造响应；有页面走了降级（模型输出 JSON 解析失败）时不缓存，下次上传可重新请求模型
+            if not any(page["filtered"] for page in formatted_results):
+                await to_thread.run_sync(
+                    result_cache.put, cache_key, {"total_pages": len(results), "results": formatted_results}
+                )
+            return ParseResult(
+                success=True,
+                total_pages=len(results),
+                results=formatted_results,
+                file_id=file_id
+            )
+        
+    except HTTPException:
+        # 重新抛出HTTP异常
+        await discard_stored_file(file_id)
+        raise
+    except Exception as e:
+        logger.exception("%s解析异常: %s", kind, e)
+        await discard_stored_file(file_id)
+        raise HTTPException(status_code=500, detail=f"{'PDF' if is_pdf else ''}解析过程发生错误: {str(e)}")
 
 @app.post("/parse/image", response_model=ParseResult, summary="解析图像文件")
 async def parse_image(
     file: UploadFile = File(..., description="要解析的图像文件 (JPG, JPEG, PNG)"),
     prompt_mode: str = "prompt_layout_all_en",
-    fitz_preprocess: bool = False
+    fitz_preprocess: bool = False,
+    persist: bool = Query(False, description="是否同时将源文件保存到文件存储，响应中返回其 file_id")
 ):
     """
     解析图像文件并提取文本和布局信息
@@ -383,6 +805,7 @@ async def parse_image(
         file: 上传的图像文件
         prompt_mode: 提示模式 (prompt_layout_all_en, prompt_layout_only_en, prompt_ocr)
         fitz_preprocess: 是否启用fitz预处理（推荐用于低DPI图像）
+        persist: 是否将源文件保存到文件存储
         
     Returns:
         ParseResult: 包含解析结果的响应对象
@@ -390,70 +813,15 @@ async def parse_image(
     Raises:
         HTTPException: 当文件验证、处理或解析失败时
     """
-    temp_dir = None
-    
-    try:
-        # 1. 验证文件格式
-        file_ext = validate_file_upload(file, ['.jpg', '.jpeg', '.png'])
-        
-        # 2. 创建临时会话目录
-        temp_dir, session_id = create_temp_session_dir()
-        print(f"DEBUG: 创建会话 {session_id}, 临时目录: {temp_dir}")
-        
-        # 3. 保存上传文件
-        temp_file_path = await save_upload_to_temp(file, temp_dir, session_id, file_ext)
-        
-        # 4. 创建输出目录
-        output_dir = os.path.join(temp_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 5. 调用DotsOCR解析器处理图像
-        print(f"DEBUG: 开始解析图像，模式: {prompt_mode}")
-        results = dots_parser.parse_image(
-            input_path=temp_file_path,
-            filename=f"api_image_{session_id}",
-            prompt_mode=prompt_mode,
-            save_dir=output_dir,
-            fitz_preprocess=fitz_preprocess
-        )
-        
-        if not results:
-            raise HTTPException(status_code=500, detail="解析器未返回结果")
-        
-        # 6. 处理解析结果
-        result = results[0]  # 图像解析只返回一个结果
-        layout_info = load_layout_info(result.get('layout_info_path'))
-        
-        print(f"DEBUG: 图像解析完成，检测到 {len(layout_info)} 个元素")
-        
-        # 7. 构造响应
-        return ParseResult(
-            success=True,
-            total_pages=1,
-            results=[{
-                "page_no": 0,
-                "full_layout_info": layout_info,
-                "session_id": session_id,
-                "filtered": result.get('filtered', False)
-            }]
-        )
-        
-    except HTTPException:
-        # 重新抛出HTTP异常
-        raise
-    except Exception as e:
-        print(f"ERROR: 图像解析异常: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"解析过程发生错误: {str(e)}")
-    finally:
-        # 8. 清理临时目录
-        if temp_dir:
-            cleanup_temp_directory(temp_dir)
+    file_ext = validate_file_upload(file, _IMG_EXTS)
+    return await _run_parse(file, file_ext, prompt_mode, fitz_preprocess, is_pdf=False, persist=persist)
 
 @app.post("/parse/pdf", response_model=ParseResult, summary="解析PDF文件")
 async def parse_pdf(
     file: UploadFile = File(..., description="要解析的PDF文件"),
     prompt_mode: str = "prompt_layout_all_en",
-    fitz_preprocess: bool = False
+    fitz_preprocess: bool = False,
+    persist: bool = Query(False, description="是否同时将源文件保存到文件存储，响应中返回其 file_id")
 ):
     """
     解析PDF文件并提取每页的文本和布局信息
@@ -462,6 +830,7 @@ async def parse_pdf(
         file: 上传的PDF文件
         prompt_mode: 提示模式 (prompt_layout_all_en, prompt_layout_only_en, prompt_ocr)
         fitz_preprocess: fitz预处理参数（对PDF文件通常不需要）
+        persist: 是否将源文件保存到文件存储
         
     Returns:
         ParseResult: 包含所有页面解析结果的响应对象
@@ -469,73 +838,15 @@ async def parse_pdf(
     Raises:
         HTTPException: 当文件验证、处理或解析失败时
     """
-    temp_dir = None
-    
-    try:
-        # 1. 验证PDF文件格式
-        file_ext = validate_file_upload(file, ['.pdf'])
-        
-        # 2. 创建临时会话目录
-        temp_dir, session_id = create_temp_session_dir()
-        print(f"DEBUG: 创建PDF解析会话 {session_id}")
-        
-        # 3. 保存上传的PDF文件
-        temp_file_path = await save_upload_to_temp(file, temp_dir, session_id, file_ext)
-        
-        # 4. 创建输出目录
-        output_dir = os.path.join(temp_dir, "output")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 5. 调用DotsOCR解析器处理PDF
-        print(f"DEBUG: 开始解析PDF，模式: {prompt_mode}")
-        results = dots_parser.parse_pdf(
-            input_path=temp_file_path,
-            filename=f"api_pdf_{session_id}",
-            prompt_mode=prompt_mode,
-            save_dir=output_dir
-        )
-        
-        if not results:
-            raise HTTPException(status_code=500, detail="PDF解析器未返回结果")
-        
-        # 6. 处理多页解析结果
-        formatted_results = []
-        for result in results:
-            layout_info = load_layout_info(result.get('layout_info_path'))
-            
-            formatted_results.append({
-                "page_no": result.get('page_no', 0),
-                "full_layout_info": layout_info,
-                "session_id": session_id,
-                "filtered": result.get('filtered', False)
-            })
-        
-        total_elements = sum(len(res["full_layout_info"]) for res in formatted_results)
-        print(f"DEBUG: PDF解析完成，共 {len(results)} 页，检测到 {total_elements} 个元素")
-        
-        # 7. 构造响应
-        return ParseResult(
-            success=True,
-            total_pages=len(results),
-            results=formatted_results
-        )
-        
-    except HTTPException:
-        # 重新抛出HTTP异常
-        raise
-    except Exception as e:
-        print(f"ERROR: PDF解析异常: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"PDF解析过程发生错误: {str(e)}")
-    finally:
-        # 8. 清理临时目录
-        if temp_dir:
-            cleanup_temp_directory(temp_dir)
+    file_ext = validate_file_upload(file, _PDF_EXTS)
+    return await _run_parse(file, file_ext, prompt_mode, fitz_preprocess, is_pdf=True, persist=persist)
 
 @app.post("/parse/file", response_model=ParseResult, summary="通用文件解析接口")
 async def parse_file(
     file: UploadFile = File(..., description="要解析的文件 (支持PDF, JPG, JPEG, PNG)"),
     prompt_mode: str = "prompt_layout_all_en",
-    fitz_preprocess: bool = False
+    fitz_preprocess: bool = False,
+    persist: bool = Query(False, description="是否同时将源文件保存到文件存储，响应中返回其 file_id")
 ):
     """
     通用文件解析接口，自动识别文件类型并调用相应的解析方法
@@ -544,6 +855,7 @@ async def parse_file(
         file: 上传的文件（PDF或图像）
         prompt_mode: 提示模式
         fitz_preprocess: 是否启用fitz预处理
+        persist: 是否将源文件保存到文件存储
         
     Returns:
         ParseResult: 解析结果，格式根据文件类型自动适配
@@ -551,27 +863,13 @@ async def parse_file(
     Raises:
         HTTPException: 当文件类型不支持或解析失败时
     """
-    try:
-        # 1. 验证文件并确定类型
-        file_ext = validate_file_upload(file, ['.pdf', '.jpg', '.jpeg', '.png'])
-        
-        # 2. 根据文件类型路由到相应的处理函数
-        if file_ext == '.pdf':
-            print(f"DEBUG: 检测到PDF文件，路由到PDF解析")
-            return await parse_pdf(file, prompt_mode, fitz_preprocess)
-        elif file_ext in ['.jpg', '.jpeg', '.png']:
-            print(f"DEBUG: 检测到图像文件 {file_ext}，路由到图像解析")
-            return await parse_image(file, prompt_mode, fitz_preprocess)
-        else:
-            # 这种情况理论上不会发生，因为validate_file_upload会先检查
-            raise HTTPException(status_code=400, detail=f"不支持的文件格式: {file_ext}")
-            
-    except HTTPException:
-        # 重新抛出HTTP异常
-        raise
-    except Exception as e:
-        print(f"ERROR: 通用文件解析异常: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"文件解析过程发生错误: {str(e)}")
+    # 1. 验证文件并确定类型（仅此一次，内部解析函数不再重复校验）
+    file_ext = validate_file_upload(file, _ALL_EXTS)
+    
+    # 2. 根据文件类型直接调用内部解析流程，上传内容只读取一次；异常处理由内部函数负责
+    is_pdf = file_ext in _PDF_EXTS
+    logger.debug("检测到文件类型 %s，路由到%s解析", file_ext, "PDF" if is_pdf else "图像")
+    return await _run_parse(file, file_ext, prompt_mode, fitz_preprocess, is_pdf=is_pdf, persist=persist)
 
 # ==================== 健康检查和信息端点 ====================
 
@@ -592,6 +890,11 @@ async def health_check():
             "port": dots_parser.port,
             "min_pixels": dots_parser.min_pixels,
             "max_pixels": dots_parser.max_pixels
+        },
+        "parse_queue": {
+            "max_concurrency": PARSE_CONCURRENCY,
+            "rps": PARSE_RPS,
+            **_parse_queue_stats
         }
     }
 
@@ -621,13 +924,17 @@ if __name__ == "__main__":
     print(f"📍 服务地址: http://0.0.0.0:8001")
     print(f"📚 API文档: http://0.0.0.0:8001/docs")
     print(f"🔧 配置信息: VLLM服务器 {dots_parser.ip}:{dots_parser.port}")
+    print(f"⚙️  工作进程数: {API_WORKERS}")
     print("=" * 60)
     
     # 启动uvicorn服务器
     uvicorn.run(
-        app, 
+        # 多进程模式下 uvicorn 需要通过导入字符串在子进程中加载应用
+        "api_service:app" if API_WORKERS > 1 else app,
         host="0.0.0.0",     # 监听所有网络接口
         port=8001,          # 服务端口
         reload=False,       # 生产环境建议关闭自动重载
-        workers=1           # 工作进程数
+        workers=API_WORKERS,  # 工作进程数，由 DOTSOCR_API_WORKERS 配置
+        loop="auto",        # 已安装 uvloop 时自动启用
+        http="auto",        # 已安装 httptools 时自动启用
     )
\ No newline at end of file
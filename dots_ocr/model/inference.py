@@ -2,6 +2,7 @@ import json
 import io
 import base64
 import math
+from functools import lru_cache
 from PIL import Image
 import requests
 from dots_ocr.utils.image_utils import PILimage_to_base64
@@ -9,6 +10,21 @@ from openai import OpenAI
 import os
 
 
+@lru_cache(maxsize=None)
+def get_openai_client(addr, api_key):
+    # reuse one client per server so its httpx pool keeps connections alive across pages/requests;
+    # transient failures (connection errors, timeouts, 429/5xx) are retried with exponential backoff
+    return OpenAI(api_key=api_key, base_url=addr, max_retries=3)
+
+
+def warmup_vllm(ip="localhost", port=8000, timeout=5.0):
+    # open a keep-alive connection in the shared client's pool before the first real request;
+    # short timeout and no retries so an unreachable server does not stall startup
+    addr = f"http://{ip}:{port}/v1"
+    client = get_openai_client(addr, "{}".format(os.environ.get("API_KEY", "0")))
+    client.with_options(timeout=timeout, max_retries=0).models.list()
+
+
 def inference_with_vllm(
         image,
         prompt, 
@@ -21,7 +37,7 @@ def inference_with_vllm(
         ):
     
     addr = f"http://{ip}:{port}/v1"
-    client = OpenAI(api_key="{}".format(os.environ.get("API_KEY", "0")), base_url=addr)
+    client = get_openai_client(addr, "{}".format(os.environ.get("API_KEY", "0")))
     messages = []
     messages.append(
         {
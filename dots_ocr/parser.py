@@ -1,11 +1,13 @@
 import os
 import json
+from io import BytesIO
 from tqdm import tqdm
 from multiprocessing.pool import ThreadPool, Pool
 import argparse
+from PIL import Image
 
 
-from dots_ocr.model.inference import inference_with_vllm
+from dots_ocr.model.inference import inference_with_vllm, warmup_vllm
 from dots_ocr.utils.consts import image_extensions, MIN_PIXELS, MAX_PIXELS
 from dots_ocr.utils.image_utils import get_image_by_fitz_doc, fetch_image, smart_resize
 from dots_ocr.utils.doc_utils import fitz_doc_to_image, load_images_from_pdf
@@ -57,6 +59,15 @@ class DotsOCRParser:
         assert self.min_pixels is None or self.min_pixels >= MIN_PIXELS
         assert self.max_pixels is None or self.max_pixels <= MAX_PIXELS
 
+    def warmup(self):
+        """
+        warm up the inference backend so the first request does not pay connection setup:
+        the hf model is already loaded in __init__; for vllm, open a pooled connection to the server
+        """
+        if self.use_hf:
+            return
+        warmup_vllm(self.ip, self.port)
+
     def _load_hf_model(self):
         import torch
         from transformers import AutoModelForCausalLM, AutoProcessor, AutoTokenizer
@@ -191,6 +202,7 @@ class DotsOCRParser:
                 result.update({
                     'layout_info_path': json_file_path,
                     'layout_image_path': image_layout_path,
+                    'layout_info': response,  # in-memory copy, saves callers re-reading the json file
                 })
 
                 md_file_path = os.path.join(save_dir, f"{save_name}.md")
@@ -218,6 +230,7 @@ class DotsOCRParser:
                 result.update({
                     'layout_info_path': json_file_path,
                     'layout_image_path': image_layout_path,
+                    'layout_info': cells,  # in-memory copy, saves callers re-reading the json file
                 })
                 if prompt_mode != "prompt_layout_only_en":  # no text md when detection only
                     md_content = layoutjson2md(origin_image, cells, text_key='text')
@@ -254,6 +267,25 @@ class DotsOCRParser:
         result = self._parse_single_image(origin_image, prompt_mode, save_dir, filename, source="image", bbox=bbox, fitz_preprocess=fitz_preprocess)
         result['file_path'] = input_path
         return [result]
+
+    def parse_image_stream(self, stream, filename, prompt_mode, save_dir, bbox=None, fitz_preprocess=False):
+        """
+        same as parse_image, but decode the image from a readable binary file object
+        (e.g. an already spooled upload) instead of a path, so callers can skip writing a temp file
+        """
+        image = Image.open(stream)
+        image.load()
+        origin_image = fetch_image(image)
+        result = self._parse_single_image(origin_image, prompt_mode, save_dir, filename, source="image", bbox=bbox, fitz_preprocess=fitz_preprocess)
+        result['file_path'] = None
+        return [result]
+
+    def parse_image_bytes(self, data, filename, prompt_mode, save_dir, bbox=None, fitz_preprocess=False):
+        """
+        same as parse_image, but decode the image from in-memory bytes
+        """
+        with BytesIO(data) as bio:
+            return self.parse_image_stream(bio, filename, prompt_mode, save_dir, bbox=bbox, fitz_preprocess=fitz_preprocess)
         
     def parse_pdf(self, input_path, filename, prompt_mode, save_dir):
         print(f"loading pdf: {input_path}")
@@ -314,7 +346,9 @@ class DotsOCRParser:
         print(f"Parsing finished, results saving to {save_dir}")
         with open(os.path.join(output_dir, os.path.basename(filename)+'.jsonl'), 'w', encoding="utf-8") as w:
             for result in results:
-                w.write(json.dumps(result, ensure_ascii=False) + '\n')
+                # layout_info is already saved in its own json file, keep the jsonl summary compact
+                summary = {k: v for k, v in result.items() if k != 'layout_info'}
+                w.write(json.dumps(summary, ensure_ascii=False) + '\n')
 
         return results
 
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import secrets
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from .config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+
+
+class ResultCache:
+    """
+    按上传内容哈希缓存解析结果（内容寻址）：
+    - 相同字节 + 相同解析参数的请求直接返回已缓存的结果，跳过解析器
+    - 写入先落临时文件再 os.replace，读者不会看到半个文件
+    - 以文件 mtime 作为最近使用时间，总大小超过上限时按 LRU 淘汰
+    注：max_bytes <= 0 表示关闭缓存。
+    """
+
+    def __init__(self, root: Path = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = 0
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._total = sum(size for _, size, _ in self._scan())
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(content_digest: str, *params) -> str:
+        """
+        由上传内容摘要与影响解析结果的参数组成缓存键。
+        参数（如 prompt_mode）来自请求，先做哈希再拼进文件名，避免路径注入。
+        """
+        params_digest = hashlib.blake2b("\x00".join(str(p) for p in params).encode(), digest_size=8).hexdigest()
+        return f"{content_digest}_{params_digest}"
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """命中时返回缓存的结果并刷新其 mtime，未命中返回 None。"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = orjson.loads(f.read())
+            os.utime(path)
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        return payload
+
+    def put(self, key: str, payload: Dict) -> None:
+        """
+        原子写入缓存条目，必要时淘汰最久未使用的条目。
+        序列化失败（如超出 64 位的整数）或写入失败（如磁盘已满）只放弃缓存，不影响调用方。
+        """
+        if not self.enabled:
+            return
+        try:
+            data = orjson.dumps(payload)
+        except TypeError:
+            return
+        path = self._path(key)
+        tmp_path = self.root / f".{key}.{secrets.token_hex(8)}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            try:
+                try:
+                    self._total -= path.stat().st_size
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp_path, path)
+                self._total += len(data)
+                if self._total > self.max_bytes:
+                    self._evict()
+            except OSError:
+                # 缓存只是尽力而为：替换或淘汰失败都不应让已成功的解析请求报错
+                tmp_path.unlink(missing_ok=True)
+
+    def _scan(self) -> List[Tuple[int, int, str]]:
+        """
+        列出缓存条目的 (mtime_ns, size, path)。
+        多个 worker 共享同一缓存目录，遍历期间条目可能已被其他进程淘汰，这类条目直接跳过。
+        """
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        """按 mtime 从旧到新删除条目，直到总大小回落到上限的 90%。需在 self._lock 内调用。"""
+        entries = self._scan()
+        entries.sort()
+        self._total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 9 // 10
+        for _, size, path in entries:
+            if self._total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self._total -= size
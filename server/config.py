@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -14,6 +15,49 @@ RESULTS_DIR = Path(os.environ.get("DOTSOCR_RESULTS_DIR", PROJECT_ROOT / "data/re
 # SQLite 数据库存放路径，默认使用项目根目录下的 data/dotsocr.db
 DB_PATH = Path(os.environ.get("DOTSOCR_DB_PATH", PROJECT_ROOT / "data/dotsocr.db"))
 
+# 同步解析接口的请求级临时目录根路径，默认系统临时目录（通常为 tmpfs 的 /tmp），避免临时文件写入数据盘
+TEMP_DIR = Path(os.environ.get("DOTSOCR_TMP_DIR", tempfile.gettempdir())) / "dots_ocr_api"
+
+# 会话临时目录池保留的空闲目录数量
+SESSION_POOL_SIZE = int(os.environ.get("DOTSOCR_SESSION_POOL_SIZE", "16"))
+
+# API 服务的 uvicorn 工作进程数；未结束任务的状态保存在进程内，多进程部署前需确认任务轮询会落到同一进程
+API_WORKERS = int(os.environ.get("DOTSOCR_API_WORKERS", "1"))
+
+# API 服务日志级别（DEBUG/INFO/WARNING/ERROR），生产环境默认 WARNING，低于该级别的日志不做格式化直接跳过
+LOG_LEVEL = os.environ.get("DOTSOCR_LOG_LEVEL", "WARNING").upper()
+
+# 同步解析接口同时在途的解析调用上限（专用线程池大小），应与 vLLM 服务可消化的并发量匹配
+PARSE_CONCURRENCY = int(os.environ.get("DOTSOCR_PARSE_CONCURRENCY", "3"))
+
+# 单个 PDF 内同时在途的页面推理请求数（解析器内部按页并发）；
+# 同时打到 vLLM 的请求总量约为 PARSE_CONCURRENCY（或 TASK_WORKERS）× PAGE_CONCURRENCY
+PAGE_CONCURRENCY = int(os.environ.get("DOTSOCR_PAGE_CONCURRENCY", "8"))
+
+# 后台解析任务（/tasks/parse）的工作线程数，超出的任务排队等待
+TASK_WORKERS = int(os.environ.get("DOTSOCR_TASK_WORKERS", "3"))
+
+# 同步解析接口每秒最多发起的解析调用数（令牌桶限速），<= 0 表示不限速
+PARSE_RPS = float(os.environ.get("DOTSOCR_PARSE_RPS", "5"))
+
+# 单次上传允许的最大请求体/文件大小（字节），通过 DOTSOCR_MAX_UPLOAD_MB 以 MB 为单位配置
+MAX_UPLOAD_SIZE = int(os.environ.get("DOTSOCR_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+
+# 上传文件流式落盘时每次读取的块大小（字节）；64 KiB 足以摊薄单次读取开销，同时压低每个并发上传的峰值内存
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# 写文件时使用的缓冲区大小（字节），远大于 Python 默认的 8 KiB，减少 write 系统调用次数
+WRITE_BUFFER_SIZE = 1 << 20
+
+# 同步解析结果缓存目录（按上传内容哈希寻址），默认位于结果目录下
+RESULT_CACHE_DIR = Path(os.environ.get("DOTSOCR_RESULT_CACHE_DIR", RESULTS_DIR / "cache"))
+
+# 解析结果缓存的总大小上限（字节），通过 DOTSOCR_RESULT_CACHE_MB 以 MB 为单位配置，<= 0 表示关闭缓存
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("DOTSOCR_RESULT_CACHE_MB", "1024")) * 1024 * 1024
+
+# 流式下载（如任务结果打包）时每次读取并发送的块大小（字节）
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
 
 def ensure_directories() -> None:
     """
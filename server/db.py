@@ -0,0 +1,20 @@
+import sqlite3
+from pathlib import Path
+
+from .config import DB_PATH, ensure_directories
+
+
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    """
+    打开 SQLite 连接并设置适合服务端并发访问的参数：
+    - WAL 模式：多个读者与一个写者可并发，跨进程（多 worker）共享同一数据库文件
+    - synchronous=NORMAL：WAL 下仍保证一致性，减少每次提交的 fsync
+    - 自动提交模式，单条语句即一次事务
+    返回的连接允许跨线程使用，调用方需自行加锁串行化访问。
+    """
+    ensure_directories()
+    conn = sqlite3.connect(str(db_path), timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
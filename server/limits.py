@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    基于令牌桶的异步限速器：
+    - 以 rate 个/秒的速度补充令牌，桶容量为 capacity
+    - acquire 在无可用令牌时异步等待，不阻塞事件循环
+    - rate <= 0 表示不限速
+    注：为避免额外依赖，这里自行实现，仅用于单个事件循环内。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
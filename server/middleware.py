@@ -0,0 +1,29 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class UploadSizeLimitMiddleware:
+    """
+    上传大小限制中间件：
+    - 在读取请求体之前检查 Content-Length，超限直接返回 413
+    - 避免超大上传先被完整接收、解析到临时文件后才被拒绝
+    注：分块传输（无 Content-Length）的请求由上传落盘时的累计大小检查兜底。
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int) -> None:
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_size:
+                        response = JSONResponse(
+                            status_code=413,
+                            content={"detail": f"上传文件过大，最大支持 {self.max_size // (1024 * 1024)} MB"},
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
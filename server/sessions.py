@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Iterator
+
+
+class SessionDirPool:
+    """
+    请求级临时会话目录池：
+    - 预先创建一批会话目录，请求到来时直接取用，避免每次 mkdir/rmtree
+    - 请求结束后只删除目录内的文件（保留子目录结构），再放回池中复用
+    - 池已满或清理失败时，直接删除该目录
+    注：目录内文件名由调用方按会话 ID 区分，复用目录不会与上一次请求冲突。
+    """
+
+    def __init__(self, root: Path, max_size: int = 16) -> None:
+        # 构造时解析为绝对路径，借出的会话目录即为绝对路径，调用方无需再逐请求 abspath
+        self.root: Path = Path(root).resolve()
+        self.max_size = max_size
+        self._free: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _create(self) -> str:
+        return tempfile.mkdtemp(prefix="session_", dir=self.root)
+
+    def prewarm(self) -> None:
+        """预先创建目录直至池满。"""
+        with self._lock:
+            while len(self._free) < self.max_size:
+                self._free.append(self._create())
+
+    def acquire(self) -> str:
+        """取出一个空的会话目录，池空时新建。"""
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return self._create()
+
+    def release(self, path: str) -> None:
+        """清空会话目录中的文件并放回池中。"""
+        try:
+            for dirpath, _, filenames in os.walk(path, topdown=False):
+                for name in filenames:
+                    os.unlink(os.path.join(dirpath, name))
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        with self._lock:
+            if len(self._free) < self.max_size:
+                self._free.append(path)
+                return
+        shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def session(self) -> Iterator[str]:
+        """以上下文管理器方式借用会话目录，退出时自动归还。"""
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def close(self) -> None:
+        """删除池中所有空闲目录（进程退出时调用）。"""
+        with self._lock:
+            while self._free:
+                shutil.rmtree(self._free.pop(), ignore_errors=True)
@@ -1,61 +1,105 @@
-import os
+import secrets
 import shutil
-import uuid
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from .config import STORAGE_DIR, ensure_directories
+from .db import connect
+
+# 进程内热点元信息缓存的最大条目数
+_META_CACHE_SIZE = 1024
 
 
 class FileStorage:
     """
     负责源文件的持久化存储与索引管理：
     - 保存上传文件到指定磁盘目录
-    - 维护文件 ID 与文件元数据的对应关系（简易基于文件系统/内存的索引）
+    - 维护文件 ID 与文件元数据的对应关系（SQLite 索引，进程重启与多 worker 间共享）
     - 提供列出文件与按 ID 获取文件路径的能力
-    注：为简化依赖，这里先使用基于磁盘的轻量实现；必要时可替换为数据库。
+    注：索引使用标准库 sqlite3，无额外依赖；热点元信息在进程内做 LRU 缓存。
     """
 
     def __init__(self) -> None:
         ensure_directories()
         self.base_dir: Path = STORAGE_DIR
-        # 简单的内存索引：进程重启会丢失，可替换为 SQLite
-        self._id_to_meta: Dict[str, Dict] = {}
+        self._db = connect()
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, stored_path TEXT NOT NULL, "
+                "dir TEXT NOT NULL, size INTEGER NOT NULL)"
+            )
+        # 仅缓存命中的元信息（不缓存未命中），文件 ID 不会复用，缓存无需失效
+        self._meta_cache: "OrderedDict[str, Dict]" = OrderedDict()
 
-    def save_upload(self, filename: str, content: bytes) -> Dict:
+    def allocate(self, filename: str) -> Tuple[str, Path]:
         """
-        保存上传文件到存储目录，生成文件 ID。
-        返回包含 id、原始文件名、保存路径 的元信息。
+        生成文件 ID 并创建其存储目录，返回 (文件 ID, 最终保存路径)。
+        调用方可直接向该路径流式写入，写完后调用 register 登记索引。
         """
-        file_id: str = uuid.uuid4().hex
+        file_id: str = secrets.token_hex(16)
         # 以文件 ID 建子目录，防止同名冲突
         target_dir: Path = self.base_dir / file_id
         target_dir.mkdir(parents=True, exist_ok=True)
         # 保留原始扩展名
         ext = Path(filename).suffix
-        stored_path: Path = target_dir / f"source{ext}"
-        with open(stored_path, "wb") as f:
-            f.write(content)
+        return file_id, target_dir / f"source{ext}"
+
+    def register(self, file_id: str, filename: str, stored_path: Path) -> Dict:
+        """登记已写入 allocate 所给路径的文件，文件大小以落盘后的 stat 为准，返回元信息。"""
+        target_dir = stored_path.parent
+        size = stored_path.stat().st_size
         meta = {
             "id": file_id,
             "filename": filename,
             "stored_path": str(stored_path.resolve()),
             "dir": str(target_dir.resolve()),
-            "size": len(content),
+            "size": size,
         }
-        self._id_to_meta[file_id] = meta
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (id, filename, stored_path, dir, size) VALUES (?, ?, ?, ?, ?)",
+                (file_id, filename, meta["stored_path"], meta["dir"], size),
+            )
         return meta
 
+    def remove(self, file_id: str) -> None:
+        """删除指定文件及其目录，并移除索引（也用于清理 allocate 后未登记的目录）。"""
+        meta = self.get_file_meta(file_id)
+        with self._db_lock:
+            self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self._meta_cache.pop(file_id, None)
+        target_dir = meta["dir"] if meta else self.base_dir / file_id  # type: ignore[index]
+        shutil.rmtree(target_dir, ignore_errors=True)
+
     def list_files(self) -> List[Dict]:
         """
-        返回当前已知的文件元信息列表。
-        仅返回内存索引中的条目。
+        返回当前已知的文件元信息列表，按上传顺序排列。
         """
-        return list(self._id_to_meta.values())
+        with self._db_lock:
+            rows = self._db.execute("SELECT id, filename, stored_path, dir, size FROM files ORDER BY rowid").fetchall()
+        return [dict(row) for row in rows]
 
     def get_file_meta(self, file_id: str) -> Optional[Dict]:
-        """按 ID 获取文件元信息。"""
-        return self._id_to_meta.get(file_id)
+        """按 ID 获取文件元信息（优先读进程内缓存）。"""
+        with self._db_lock:
+            meta = self._meta_cache.get(file_id)
+            if meta is not None:
+                self._meta_cache.move_to_end(file_id)
+                return meta
+            row = self._db.execute(
+                "SELECT id, filename, stored_path, dir, size FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            meta = dict(row)
+            self._meta_cache[file_id] = meta
+            if len(self._meta_cache) > _META_CACHE_SIZE:
+                self._meta_cache.popitem(last=False)
+            return meta
 
     def get_file_path(self, file_id: str) -> Optional[Path]:
         """按 ID 获取文件物理路径。"""
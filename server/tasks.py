@@ -1,11 +1,20 @@
 import json
+import logging
 import os
+import secrets
 import threading
-import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional, List, Callable
 
-from .config import RESULTS_DIR, ensure_directories
+from .config import RESULTS_DIR, TASK_WORKERS, ensure_directories
+from .db import connect
+
+logger = logging.getLogger("dots_ocr.tasks")
+
+# 进程内保留的任务记录上限，超出后淘汰最久未访问的已结束任务
+_MAX_TASKS = 10_000
 
 
 class TaskStatus:
@@ -15,61 +24,173 @@ class TaskStatus:
     FAILED = "failed"
 
 
+_TERMINAL_STATUSES = frozenset((TaskStatus.SUCCESS, TaskStatus.FAILED))
+
+
+class TaskRecord:
+    """
+    单个任务的状态记录，自带一把锁：
+    不同任务的状态/进度更新互不阻塞，只有同一任务的多字段更新才会串行。
+    """
+
+    __slots__ = ("id", "status", "progress", "dir", "error", "artifacts", "_lock")
+
+    def __init__(self, task_id: str, task_dir: str) -> None:
+        self.id = task_id
+        self.status = TaskStatus.PENDING
+        self.progress = 0
+        self.dir = task_dir
+        self.error: Optional[str] = None
+        self.artifacts: Dict = {}
+        self._lock = threading.Lock()
+
+    def update(self, **kwargs) -> None:
+        # 多字段一起更新，读者通过 to_dict 总能看到一致的快照
+        with self._lock:
+            for key, value in kwargs.items():
+                setattr(self, key, value)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "progress": self.progress,
+                "dir": self.dir,
+                "error": self.error,
+                "artifacts": self.artifacts,
+            }
+
+
 class TaskManager:
     """
     负责解析任务的异步调度与状态管理：
     - 创建任务并返回任务 ID
-    - 后台线程执行实际解析回调
+    - 在固定大小的线程池中执行实际解析回调，超出的任务排队等待
     - 跟踪任务进度与结果输出目录
-    注：为避免额外依赖，这里使用线程作为简易队列。
+    - 进程内任务表有上限（LRU），已结束的任务写入 SQLite，淘汰后仍可查询
+    - 每个任务记录自带锁，对外返回字典快照
+    注：为避免额外依赖，这里使用标准库线程池作为简易队列。
     """
 
     def __init__(self) -> None:
         ensure_directories()
         self.base_dir: Path = RESULTS_DIR
-        self._tasks: Dict[str, Dict] = {}
-        self._lock = threading.Lock()
+        self._tasks: "OrderedDict[str, TaskRecord]" = OrderedDict()
+        self._max_tasks = _MAX_TASKS
+        # 索引锁只保护任务表的插入、淘汰与遍历，状态更新走各任务自己的锁
+        self._index_lock = threading.Lock()
+        self._db = connect()
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, progress INTEGER NOT NULL, "
+                "dir TEXT NOT NULL, error TEXT, artifacts TEXT NOT NULL)"
+            )
+        # 有界工作线程池：限制同时运行的任务数，避免每个任务新建线程压垮 CPU 与下游 vLLM 服务
+        self._pool = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix="dotsocr-task")
 
     def _update(self, task_id: str, **kwargs) -> None:
-        with self._lock:
-            if task_id in self._tasks:
-                self._tasks[task_id].update(kwargs)
+        # 单次字典查找在 GIL 下是原子的，无需持有索引锁
+        record = self._tasks.get(task_id)
+        if record is not None:
+            record.update(**kwargs)
+
+    def _finish(self, task_id: str, final: Dict) -> None:
+        """
+        写入任务的结束状态：先落库 SQLite，再更新内存记录。
+        记录在变为结束状态前不会被淘汰，因此落库时内存记录必然存在；淘汰后仍可从库中查询。
+        落库失败（如多 worker 下数据库锁超时）只记录日志，内存状态仍会更新，任务不会卡在 running。
+        """
+        try:
+            record = self._tasks[task_id].to_dict()
+            record.update(final)
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tasks (id, status, progress, dir, error, artifacts) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        record["id"],
+                        record["status"],
+                        record["progress"],
+                        record["dir"],
+                        record["error"],
+                        json.dumps(record["artifacts"], ensure_ascii=False),
+                    ),
+                )
+        except Exception:
+            logger.exception("任务 %s 结束状态写入数据库失败，淘汰后将无法查询", task_id)
+        finally:
+            self._update(task_id, **final)
+
+    def _evict(self) -> None:
+        """超出上限时从最旧一端淘汰已结束的任务；运行中/排队中的任务不淘汰。需在 self._index_lock 内调用。"""
+        excess = len(self._tasks) - self._max_tasks
+        if excess <= 0:
+            return
+        victims = []
+        for task_id, record in self._tasks.items():
+            if record.status in _TERMINAL_STATUSES:
+                victims.append(task_id)
+                if len(victims) >= excess:
+                    break
+        for task_id in victims:
+            del self._tasks[task_id]
 
     def create_task(self, job: Callable[[str], Dict]) -> Dict:
         """
         创建任务并异步执行 job 回调。
         job 接收任务输出目录路径，返回 {"ok": bool, "error": str|None, "artifacts": dict}
         """
-        task_id = uuid.uuid4().hex
-        task_dir = self.base_dir / task_id
+        task_id = secrets.token_hex(16)
+        # 按任务 ID 前两位分桶，避免结果目录下单层条目无限增长
+        task_dir = self.base_dir / task_id[:2] / task_id
         task_dir.mkdir(parents=True, exist_ok=True)
-        record = {
-            "id": task_id,
-            "status": TaskStatus.PENDING,
-            "progress": 0,
-            "dir": str(task_dir.resolve()),
-            "error": None,
-            "artifacts": {},
-        }
-        self._tasks[task_id] = record
+        record = TaskRecord(task_id, str(task_dir.resolve()))
+        with self._index_lock:
+            self._tasks[task_id] = record
+            self._evict()
 
         def _run():
             try:
                 self._update(task_id, status=TaskStatus.RUNNING, progress=5)
                 result = job(str(task_dir.resolve()))
                 if result.get("ok"):
-                    self._update(task_id, status=TaskStatus.SUCCESS, progress=100, artifacts=result.get("artifacts", {}))
+                    final = {"status": TaskStatus.SUCCESS, "progress": 100, "artifacts": result.get("artifacts", {})}
                 else:
-                    self._update(task_id, status=TaskStatus.FAILED, progress=100, error=result.get("error", "unknown error"))
+                    final = {"status": TaskStatus.FAILED, "progress": 100, "error": result.get("error", "unknown error")}
             except Exception as e:
-                self._update(task_id, status=TaskStatus.FAILED, progress=100, error=str(e))
+                final = {"status": TaskStatus.FAILED, "progress": 100, "error": str(e)}
+            self._finish(task_id, final)
+
+        self._pool.submit(_run)
+        return record.to_dict()
 
-        threading.Thread(target=_run, daemon=True).start()
-        return record
+    def shutdown(self) -> None:
+        """停止接收新任务，并等待排队与运行中的任务执行完毕。"""
+        self._pool.shutdown(wait=True)
 
     def get(self, task_id: str) -> Optional[Dict]:
-        return self._tasks.get(task_id)
+        # 先查进程内任务表（O(1)，并刷新 LRU 顺序），未命中再查 SQLite 中的历史任务
+        with self._index_lock:
+            record = self._tasks.get(task_id)
+            if record is not None:
+                self._tasks.move_to_end(task_id)
+        if record is not None:
+            return record.to_dict()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, status, progress, dir, error, artifacts FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        snapshot = dict(row)
+        snapshot["artifacts"] = json.loads(snapshot["artifacts"])
+        return snapshot
 
     def list(self) -> List[Dict]:
-        return list(self._tasks.values())
+        # 在索引锁内取记录列表，避免后台线程插入任务时遍历字典报错；各记录的字典快照在锁外生成
+        with self._index_lock:
+            records = list(self._tasks.values())
+        return [record.to_dict() for record in records]
 